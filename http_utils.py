@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP session setup for the Spotify and Tidal clients.
+"""
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def mount_pooled_adapter(session):
+    """
+    Mount a pooled HTTPS adapter with retries on the given requests session.
+    Connections are kept alive between calls, and 429/5xx responses are
+    retried with backoff, honouring any Retry-After header.
+    """
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+def create_pooled_session():
+    """Create a new requests session with a pooled HTTPS adapter"""
+    return mount_pooled_adapter(requests.Session())
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    Allows bursts of up to `capacity` requests, refilled at `rate` per second.
+    Use as a context manager to wait for a token before making a request.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+def get_retry_after(response, default=1.0):
+    """Get the number of seconds to wait from a response's Retry-After header"""
+    try:
+        return max(float(response.headers.get("Retry-After", default)), 0)
+    except ValueError:  # HTTP-date form, not worth parsing
+        return default
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+JSON file helpers backed by orjson.
+"""
+import orjson
+
+def dump_json(obj, path):
+    """Write obj to path as indented JSON"""
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+
+def load_json(path):
+    """Read and parse the JSON file at path"""
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+def write_jsonl(obj, f):
+    """Append obj as a single JSON line to the binary file f"""
+    f.write(orjson.dumps(obj) + b"\n")
+    f.flush()
+
+def iter_jsonl(path):
+    """Yield the parsed objects of a JSON Lines file, one per line"""
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
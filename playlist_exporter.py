@@ -2,18 +2,32 @@
 """
 Export personally created playlists from Spotify.
 """
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from http_utils import create_pooled_session
+from io_utils import dump_json, load_json
 
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
 
+# Maximum number of pages fetched from Spotify in parallel
+MAX_PAGE_WORKERS = 8
+
+# Maximum page sizes allowed by the Spotify API
+PLAYLISTS_PAGE_SIZE = 50
+PLAYLIST_ITEMS_PAGE_SIZE = 100
+
+# Maximum number of track IDs accepted by the bulk tracks endpoint
+TRACKS_BATCH_SIZE = 50
+
+# Only the track IDs are needed from playlist items, full info comes from the tracks endpoint
+PLAYLIST_ITEMS_FIELDS = "items(track(id)),next,total"
+
 def load_config():
     """Load configuration from config.json"""
-    with open("config.json", "r") as f:
-        return json.load(f)
+    return load_json("config.json")
 
 def get_spotify_client():
     """Initialize and return Spotify client with user authentication"""
@@ -21,16 +35,41 @@ def get_spotify_client():
 
     scope = "playlist-read-private playlist-read-collaborative"
 
-    sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-        client_id=config["spotify"]["client_id"],
-        client_secret=config["spotify"]["client_secret"],
-        redirect_uri=config["spotify"]["redirect_uri"],
-        scope=scope,
-        cache_path=".spotify_cache"
-    ))
+    sp = spotipy.Spotify(
+        auth_manager=SpotifyOAuth(
+            client_id=config["spotify"]["client_id"],
+            client_secret=config["spotify"]["client_secret"],
+            redirect_uri=config["spotify"]["redirect_uri"],
+            scope=scope,
+            cache_path=".spotify_cache"
+        ),
+        requests_session=create_pooled_session()
+    )
 
     return sp
 
+def fetch_all_items(sp, fetch_page, limit):
+    """
+    Fetch the items of every page of an offset-paginated Spotify endpoint.
+    The first page tells us the total, so the remaining offsets are fetched
+    concurrently. Falls back to following 'next' links if no total is given.
+    """
+    results = fetch_page(0)
+    items = list(results['items'])
+    total = results.get('total')
+
+    if total is None:
+        while results['next']:
+            results = sp.next(results)
+            items.extend(results['items'])
+        return items
+
+    with ThreadPoolExecutor(max_workers=MAX_PAGE_WORKERS) as executor:
+        for page in executor.map(fetch_page, range(limit, total, limit)):
+            items.extend(page['items'])
+
+    return items
+
 def get_user_playlists(sp):
     """Get all playlists owned by the current user"""
     print("Fetching your playlists...\n")
@@ -41,33 +80,57 @@ def get_user_playlists(sp):
     print(f"Logged in as: {current_user['display_name']} ({user_id})\n")
 
     playlists = []
-    results = sp.current_user_playlists(limit=50)
-
-    while results:
-        for playlist in results['items']:
-            # Only include playlists owned by the current user
-            if playlist['owner']['id'] == user_id:
-                playlists.append(playlist)
-                print(f"  Found: {playlist['name']} ({playlist['tracks']['total']} tracks)")
-
-        if results['next']:
-            results = sp.next(results)
-        else:
-            break
+    all_playlists = fetch_all_items(
+        sp,
+        lambda offset: sp.current_user_playlists(limit=PLAYLISTS_PAGE_SIZE, offset=offset),
+        PLAYLISTS_PAGE_SIZE
+    )
+
+    for playlist in all_playlists:
+        # Only include playlists owned by the current user
+        if playlist['owner']['id'] == user_id:
+            # This endpoint has no fields filter, so drop what we don't use (images, snapshot, etc.)
+            playlists.append({
+                'id': playlist['id'],
+                'name': playlist['name'],
+                'description': playlist.get('description', ''),
+                'public': playlist['public'],
+                'collaborative': playlist['collaborative'],
+                'external_urls': playlist['external_urls']
+            })
+            print(f"  Found: {playlist['name']} ({playlist['tracks']['total']} tracks)")
 
     print(f"\nTotal personally created playlists: {len(playlists)}")
     return playlists, user_id
 
-def get_playlist_tracks(sp, playlist_id):
-    """Get all tracks from a playlist"""
-    tracks = []
-    results = sp.playlist_tracks(playlist_id, limit=100)
-
-    while results:
-        for item in results['items']:
-            if item['track'] is not None:  # Skip local files or removed tracks
-                track = item['track']
-                tracks.append({
+def get_playlist_track_ids(sp, playlist_id):
+    """Get the IDs of all tracks in a playlist, in playlist order"""
+    items = fetch_all_items(
+        sp,
+        lambda offset: sp.playlist_items(
+            playlist_id, fields=PLAYLIST_ITEMS_FIELDS, limit=PLAYLIST_ITEMS_PAGE_SIZE, offset=offset
+        ),
+        PLAYLIST_ITEMS_PAGE_SIZE
+    )
+
+    # Skip local files or removed tracks
+    return [item['track']['id'] for item in items if item['track'] and item['track']['id']]
+
+def get_tracks(sp, track_ids):
+    """
+    Get full track info for the given track IDs using the bulk tracks endpoint.
+    Returns a dict mapping each track ID to its exported track info.
+    """
+    track_ids = list(track_ids)
+    batches = [track_ids[i:i + TRACKS_BATCH_SIZE] for i in range(0, len(track_ids), TRACKS_BATCH_SIZE)]
+
+    tracks = {}
+    with ThreadPoolExecutor(max_workers=MAX_PAGE_WORKERS) as executor:
+        for results in executor.map(sp.tracks, batches):
+            for track in results['tracks']:
+                if track is None:  # Unknown or unavailable track
+                    continue
+                tracks[track['id']] = {
                     'name': track['name'],
                     'artists': [artist['name'] for artist in track['artists']],
                     'album': track['album']['name'],
@@ -75,15 +138,25 @@ def get_playlist_tracks(sp, playlist_id):
                     'id': track['id'],
                     'isrc': track.get('external_ids', {}).get('isrc'),  # International Standard Recording Code
                     'duration_ms': track['duration_ms']
-                })
-
-        if results['next']:
-            results = sp.next(results)
-        else:
-            break
+                }
 
     return tracks
 
+def build_playlist_data(playlist, track_ids, tracks_by_id):
+    """Build the exported form of a playlist from its track IDs and the fetched track info"""
+    tracks = [tracks_by_id[tid] for tid in track_ids if tid in tracks_by_id]
+
+    return {
+        'spotify_id': playlist['id'],
+        'name': playlist['name'],
+        'description': playlist.get('description', ''),
+        'public': playlist['public'],
+        'collaborative': playlist['collaborative'],
+        'track_count': len(tracks),
+        'spotify_url': playlist['external_urls']['spotify'],
+        'tracks': tracks
+    }
+
 def export_playlists():
     """Export all personally created playlists with their tracks"""
     sp = get_spotify_client()
@@ -96,34 +169,37 @@ def export_playlists():
 
     print("\nExporting playlist details...\n")
 
-    exported_playlists = []
+    playlist_track_ids = []
 
     for i, playlist in enumerate(playlists, 1):
-        print(f"[{i}/{len(playlists)}] Exporting: {playlist['name']}")
+        print(f"[{i}/{len(playlists)}] Listing tracks: {playlist['name']}")
+        playlist_track_ids.append(get_playlist_track_ids(sp, playlist['id']))
+
+    # Fetch each track only once, even if it appears in several playlists
+    unique_ids = dict.fromkeys(tid for track_ids in playlist_track_ids for tid in track_ids)
+    print(f"\nFetching details for {len(unique_ids)} unique tracks...\n")
+    tracks_by_id = get_tracks(sp, unique_ids)
 
-        tracks = get_playlist_tracks(sp, playlist['id'])
+    exported_playlists = []
 
-        playlist_data = {
-            'spotify_id': playlist['id'],
-            'name': playlist['name'],
-            'description': playlist.get('description', ''),
-            'public': playlist['public'],
-            'collaborative': playlist['collaborative'],
-            'track_count': len(tracks),
-            'spotify_url': playlist['external_urls']['spotify'],
-            'tracks': tracks
-        }
+    for playlist, track_ids in zip(playlists, playlist_track_ids):
+        playlist_data = build_playlist_data(playlist, track_ids, tracks_by_id)
 
         exported_playlists.append(playlist_data)
-        print(f"    Exported {len(tracks)} tracks")
+        print(f"  Exported: {playlist['name']} ({playlist_data['track_count']} tracks)")
 
     # Save to file
     output_file = DATA_DIR / "spotify_playlists.json"
-    with open(output_file, "w") as f:
-        json.dump(exported_playlists, f, indent=2)
+    dump_json(exported_playlists, output_file)
 
     print(f"\n✓ Exported {len(exported_playlists)} playlists to {output_file}")
 
+    # Save every unique track once, indexed by Spotify ID
+    tracks_file = DATA_DIR / "spotify_tracks.json"
+    dump_json(tracks_by_id, tracks_file)
+
+    print(f"✓ Exported {len(tracks_by_id)} unique tracks to {tracks_file}")
+
     # Print summary
     total_tracks = sum(p['track_count'] for p in exported_playlists)
     print(f"\nSummary:")
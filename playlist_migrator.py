@@ -2,27 +2,52 @@
 """
 Migrate Spotify playlists to Tidal.
 """
-import json
-import time
+import asyncio
+import io
+import shelve
 from pathlib import Path
 import tidalapi
-from tidal_auth import load_tidal_session
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+from tidal_auth import TIDAL_RATE_LIMITER, call_rate_limited, load_tidal_session
+from io_utils import iter_jsonl, load_json, write_jsonl
 
 DATA_DIR = Path("data")
 
-def search_track_on_tidal(track_info, tidal_session):
+# Maximum number of Tidal searches in flight at once
+MAX_CONCURRENT_SEARCHES = 8
+
+# Persistent cache of confident Tidal track matches, reused across runs.
+# Bump the version whenever the matching logic changes, so old matches are dropped.
+SEARCH_CACHE_FILE = ".tidal_track_cache"
+SEARCH_CACHE_VERSION = 2
+SEARCH_CACHE_VERSION_KEY = "__version__"
+
+# Maximum number of tracks added to a Tidal playlist per request
+# (tidalapi sends its add requests with limit=100)
+ADD_BATCH_SIZE = 100
+
+# Minimum fuzzy match score (0-100) for a Tidal result to count as a match
+MATCH_SCORE_CUTOFF = 75
+
+async def search_track_on_tidal(track_info, tidal_session):
     """
     Search for a track on Tidal using various search strategies.
-    Returns the best match or None.
+    Returns (match, confident): the best match or None, and whether it was
+    an ISRC hit or a fuzzy match above MATCH_SCORE_CUTOFF rather than a
+    fallback guess.
     """
     # Strategy 1: Search by ISRC (most reliable)
     if track_info.get('isrc'):
         try:
-            results = tidal_session.search(track_info['isrc'], models=[tidalapi.media.Track], limit=5)
+            results = await asyncio.to_thread(
+                call_rate_limited, TIDAL_RATE_LIMITER, tidal_session.search,
+                track_info['isrc'], models=[tidalapi.media.Track], limit=5
+            )
             if results.get('tracks') and len(results['tracks']) > 0:
                 for track in results['tracks']:
                     if track.isrc == track_info['isrc']:
-                        return track
+                        return track, True
         except Exception as e:
             pass  # Fall through to next strategy
 
@@ -31,31 +56,184 @@ def search_track_on_tidal(track_info, tidal_session):
     query = f"{artists_str} {track_info['name']}"
 
     try:
-        results = tidal_session.search(query, models=[tidalapi.media.Track], limit=10)
+        results = await asyncio.to_thread(
+            call_rate_limited, TIDAL_RATE_LIMITER, tidal_session.search,
+            query, models=[tidalapi.media.Track], limit=10
+        )
 
         if results.get('tracks') and len(results['tracks']) > 0:
-            # Find best match by comparing artist and track name
-            track_name_lower = track_info['name'].lower()
-            track_artists_lower = [a.lower() for a in track_info['artists']]
-
-            for tidal_track in results['tracks']:
-                tidal_name_lower = tidal_track.name.lower()
-                tidal_artist_lower = tidal_track.artist.name.lower()
-
-                # Check if names match closely
-                if track_name_lower in tidal_name_lower or tidal_name_lower in track_name_lower:
-                    # Check if at least one artist matches
-                    if any(artist in tidal_artist_lower or tidal_artist_lower in artist
-                           for artist in track_artists_lower):
-                        return tidal_track
+            # Find best match by fuzzy comparing "artist - track name" strings
+            target = f"{', '.join(track_info['artists'])} - {track_info['name']}"
+            candidates = {
+                i: f"{tidal_track.artist.name} - {tidal_track.name}"
+                for i, tidal_track in enumerate(results['tracks'])
+            }
+
+            best = process.extractOne(
+                target,
+                candidates,
+                scorer=fuzz.token_set_ratio,
+                processor=default_process,
+                score_cutoff=MATCH_SCORE_CUTOFF
+            )
+            if best:
+                return results['tracks'][best[2]], True
 
             # If no good match, return the first result
-            return results['tracks'][0]
+            return results['tracks'][0], False
 
     except Exception as e:
         print(f"    Error searching: {e}")
 
-    return None
+    return None, False
+
+def open_search_cache():
+    """
+    Open the persistent cache of Tidal track matches.
+    The cache is cleared if it was written by an older version of the matcher.
+    """
+    cache = shelve.open(SEARCH_CACHE_FILE)
+    if cache.get(SEARCH_CACHE_VERSION_KEY) != SEARCH_CACHE_VERSION:
+        cache.clear()
+        cache[SEARCH_CACHE_VERSION_KEY] = SEARCH_CACHE_VERSION
+    return cache
+
+async def search_tracks_on_tidal(tracks, tidal_session, cache, name):
+    """
+    Search for several tracks on Tidal concurrently.
+    Returns the matches (or None) in the same order as the input tracks.
+    Progress is reported under name, the playlist the tracks belong to.
+
+    Confident matches are stored in cache, keyed by ISRC (or artists and
+    title), so a track that appears in several playlists or runs is only
+    searched once. Fallback guesses are not cached and are searched again.
+    """
+    sem = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+    n_tracks = len(tracks)
+    done = 0
+
+    async def bounded_search(track):
+        nonlocal done
+        key = track.get('isrc') or f"{'/'.join(track['artists'])}|{track['name']}"
+
+        if key in cache:
+            tidal_match = cache[key]
+        else:
+            async with sem:
+                tidal_track, confident = await search_track_on_tidal(track, tidal_session)
+
+            tidal_match = None
+            if tidal_track:
+                tidal_match = {
+                    'id': tidal_track.id,
+                    'name': tidal_track.name,
+                    'artist': tidal_track.artist.name,
+                    'album': tidal_track.album.name if tidal_track.album else None
+                }
+                if confident:
+                    cache[key] = tidal_match
+
+        done += 1
+        if done % 10 == 0:
+            print(f"    Progress for {name}: {done}/{n_tracks}")
+
+        return tidal_match
+
+    tasks = [bounded_search(track) for track in tracks]
+    return await asyncio.gather(*tasks)
+
+async def migrate_playlist(playlist, tidal_session, search_cache, dry_run=False):
+    """
+    Search for the tracks of one exported Spotify playlist on Tidal and,
+    unless dry_run is set, create the playlist there.
+    Returns the migration result for the playlist.
+    """
+    tracks = playlist['tracks']
+    n_tracks = len(tracks)
+    name = playlist['name']
+    description = playlist.get('description', '')
+    track_count = playlist['track_count']
+
+    print(f"  Tracks in {name}: {track_count}")
+
+    track_results = []
+    found_count = 0
+
+    print(f"  Searching for tracks of {name} on Tidal...")
+
+    tidal_matches = await search_tracks_on_tidal(tracks, tidal_session, search_cache, name)
+
+    for track, tidal_match in zip(tracks, tidal_matches):
+        if tidal_match:
+            found_count += 1
+            track_results.append({
+                'spotify_track_id': track['id'],
+                'tidal_found': True,
+                'tidal_id': tidal_match['id'],
+                'tidal_name': tidal_match['name'],
+                'tidal_artist': tidal_match['artist'],
+                'tidal_album': tidal_match['album']
+            })
+        else:
+            track_results.append({
+                'spotify_track_id': track['id'],
+                'tidal_found': False
+            })
+
+    if n_tracks > 0:
+        print(f"  Found {found_count}/{n_tracks} tracks on Tidal for {name} ({found_count/n_tracks*100:.1f}%)")
+    else:
+        print(f"  Playlist is empty: {name}")
+
+    # Create playlist on Tidal (if not dry run)
+    tidal_playlist_id = None
+    tidal_playlist_url = None
+    tracks_added = 0
+    migration_error = None
+
+    if not dry_run:
+        try:
+            print(f"  Creating playlist on Tidal: {name}")
+
+            # Record the playlist as soon as it exists, even if adding tracks fails later
+            tidal_playlist = await asyncio.to_thread(tidal_session.user.create_playlist, name, description)
+            tidal_playlist_id = tidal_playlist.id
+            tidal_playlist_url = f"https://listen.tidal.com/playlist/{tidal_playlist_id}"
+
+            # Add tracks to playlist
+            tracks_to_add = [tr['tidal_id'] for tr in track_results if tr['tidal_found']]
+
+            # Tidal has a limit on how many tracks can be added at once
+            for batch_start in range(0, len(tracks_to_add), ADD_BATCH_SIZE):
+                batch = tracks_to_add[batch_start:batch_start + ADD_BATCH_SIZE]
+                await asyncio.to_thread(call_rate_limited, TIDAL_RATE_LIMITER, tidal_playlist.add, batch)
+                tracks_added += len(batch)
+
+            print(f"  ✓ Created playlist: {tidal_playlist_url}")
+
+        except Exception as e:
+            migration_error = str(e)
+            if tidal_playlist_id is None:
+                print(f"  ✗ Error creating playlist {name}: {e}")
+            else:
+                print(f"  ✗ Playlist {name} was created but only {tracks_added}/{found_count} tracks were added: {e}")
+
+    return {
+        'spotify_playlist': {
+            'name': name,
+            'description': description,
+            'track_count': track_count,
+            'spotify_url': playlist['spotify_url']
+        },
+        'tidal_playlist_id': tidal_playlist_id,
+        'tidal_playlist_url': tidal_playlist_url,
+        'tracks_added': tracks_added,
+        'migration_error': migration_error,
+        'tracks_found': found_count,
+        'tracks_total': n_tracks,
+        'match_rate': found_count / n_tracks if n_tracks > 0 else 0,
+        'track_results': track_results
+    }
 
 def migrate_playlists(dry_run=False):
     """
@@ -70,8 +248,7 @@ def migrate_playlists(dry_run=False):
         print(f"Error: {input_file} not found. Run playlist_exporter.py first.")
         return
 
-    with open(input_file, "r") as f:
-        playlists = json.load(f)
+    playlists = load_json(input_file)
 
     print(f"Migrating {len(playlists)} playlists to Tidal...\n")
 
@@ -81,177 +258,98 @@ def migrate_playlists(dry_run=False):
         print("Failed to authenticate with Tidal")
         return
 
-    migration_results = []
-
-    for i, playlist in enumerate(playlists, 1):
-        print(f"\n[{i}/{len(playlists)}] Processing: {playlist['name']}")
-        print(f"  Tracks: {playlist['track_count']}")
-
-        track_results = []
-        found_count = 0
-
-        print(f"  Searching for tracks on Tidal...")
-
-        for j, track in enumerate(playlist['tracks'], 1):
-            track_str = f"{', '.join(track['artists'])} - {track['name']}"
-
-            if j % 10 == 0:
-                print(f"    Progress: {j}/{len(playlist['tracks'])}")
-
-            tidal_track = search_track_on_tidal(track, tidal_session)
-
-            if tidal_track:
-                found_count += 1
-                track_results.append({
-                    'spotify_track': track,
-                    'tidal_found': True,
-                    'tidal_id': tidal_track.id,
-                    'tidal_name': tidal_track.name,
-                    'tidal_artist': tidal_track.artist.name,
-                    'tidal_album': tidal_track.album.name if tidal_track.album else None
-                })
-            else:
-                track_results.append({
-                    'spotify_track': track,
-                    'tidal_found': False
-                })
+    # Results are written one playlist per line as soon as each one is done
+    output_file = DATA_DIR / "playlist_migration_results.jsonl"
+    with open_search_cache() as search_cache, open(output_file, "wb") as results_file:
+        for i, playlist in enumerate(playlists, 1):
+            print(f"\n[{i}/{len(playlists)}] Processing: {playlist['name']}")
 
-            # Rate limiting
-            time.sleep(0.2)
-
-        if len(playlist['tracks']) > 0:
-            print(f"  Found {found_count}/{len(playlist['tracks'])} tracks on Tidal ({found_count/len(playlist['tracks'])*100:.1f}%)")
-        else:
-            print(f"  Playlist is empty")
-
-        # Create playlist on Tidal (if not dry run)
-        tidal_playlist_id = None
-        tidal_playlist_url = None
-
-        if not dry_run:
-            try:
-                print(f"  Creating playlist on Tidal...")
-
-                # Create the playlist
-                tidal_playlist = tidal_session.user.create_playlist(
-                    playlist['name'],
-                    playlist.get('description', '')
-                )
-
-                tidal_playlist_id = tidal_playlist.id
-                tidal_playlist_url = f"https://listen.tidal.com/playlist/{tidal_playlist_id}"
-
-                # Add tracks to playlist
-                tracks_to_add = [tr['tidal_id'] for tr in track_results if tr['tidal_found']]
-
-                if tracks_to_add:
-                    # Tidal has a limit on how many tracks can be added at once
-                    batch_size = 100
-                    for batch_start in range(0, len(tracks_to_add), batch_size):
-                        batch = tracks_to_add[batch_start:batch_start + batch_size]
-                        tidal_playlist.add(batch)
-                        time.sleep(0.5)
-
-                print(f"  ✓ Created playlist: {tidal_playlist_url}")
-
-            except Exception as e:
-                print(f"  ✗ Error creating playlist: {e}")
-
-        migration_results.append({
-            'spotify_playlist': {
-                'name': playlist['name'],
-                'description': playlist['description'],
-                'track_count': playlist['track_count'],
-                'spotify_url': playlist['spotify_url']
-            },
-            'tidal_playlist_id': tidal_playlist_id,
-            'tidal_playlist_url': tidal_playlist_url,
-            'tracks_found': found_count,
-            'tracks_total': len(playlist['tracks']),
-            'match_rate': found_count / len(playlist['tracks']) if len(playlist['tracks']) > 0 else 0,
-            'track_results': track_results
-        })
-
-    # Save results
-    output_file = DATA_DIR / "playlist_migration_results.json"
-    with open(output_file, "w") as f:
-        json.dump(migration_results, f, indent=2)
+            result = asyncio.run(migrate_playlist(playlist, tidal_session, search_cache, dry_run))
+            write_jsonl(result, results_file)
 
     print(f"\n✓ Saved migration results to {output_file}")
-    return migration_results
+    return len(playlists)
 
 def generate_playlist_report():
     """Generate a human-readable report for playlist migration"""
-    input_file = DATA_DIR / "playlist_migration_results.json"
+    input_file = DATA_DIR / "playlist_migration_results.jsonl"
+    tracks_file = DATA_DIR / "spotify_tracks.json"
 
     if not input_file.exists():
         print(f"Error: {input_file} not found. Run migration first.")
         return
 
-    with open(input_file, "r") as f:
-        results = json.load(f)
+    if not tracks_file.exists():
+        print(f"Error: {tracks_file} not found. Run playlist_exporter.py first.")
+        return
 
-    total_playlists = len(results)
-    total_tracks = sum(r['tracks_total'] for r in results)
-    total_found = sum(r['tracks_found'] for r in results)
-    overall_match_rate = total_found / total_tracks if total_tracks > 0 else 0
+    # Track results only hold Spotify IDs, the track details live here
+    tracks_by_id = load_json(tracks_file)
+
+    total_playlists = 0
+    total_tracks = 0
+    total_found = 0
+
+    # Read results one playlist at a time, buffering the per-playlist sections
+    # until the totals for the report header are known
+    sections = io.StringIO()
+
+    for result in iter_jsonl(input_file):
+        total_playlists += 1
+        total_tracks += result['tracks_total']
+        total_found += result['tracks_found']
 
-    # Generate markdown report
-    report_lines = [
-        "# Spotify to Tidal Playlist Migration Report",
-        "",
-        f"**Total Playlists:** {total_playlists}",
-        f"**Total Tracks:** {total_tracks}",
-        f"**Tracks Found on Tidal:** {total_found} ({overall_match_rate*100:.1f}%)",
-        f"**Tracks Not Found:** {total_tracks - total_found}",
-        "",
-        "---",
-        "",
-        "## Playlists",
-        ""
-    ]
-
-    for result in results:
         playlist = result['spotify_playlist']
-        report_lines.append(f"### {playlist['name']}")
-        report_lines.append("")
-        report_lines.append(f"**Tracks:** {result['tracks_found']}/{result['tracks_total']} found ({result['match_rate']*100:.1f}%)")
-        report_lines.append("")
-        report_lines.append(f"- Spotify: {playlist['spotify_url']}")
-
-        if result.get('tidal_playlist_url'):
-            report_lines.append(f"- Tidal: {result['tidal_playlist_url']}")
+        sections.write(f"### {playlist['name']}\n\n")
+        sections.write(f"**Tracks:** {result['tracks_found']}/{result['tracks_total']} found ({result['match_rate']*100:.1f}%)\n\n")
+        sections.write(f"- Spotify: {playlist['spotify_url']}\n")
+
+        if result.get('migration_error'):
+            if result.get('tidal_playlist_url'):
+                sections.write(f"- Tidal: {result['tidal_playlist_url']}\n")
+                sections.write(f"- **Partially migrated:** only {result['tracks_added']}/{result['tracks_found']} tracks added ({result['migration_error']})\n\n")
+            else:
+                sections.write(f"- Tidal: **Migration failed** ({result['migration_error']})\n\n")
+        elif result.get('tidal_playlist_url'):
+            sections.write(f"- Tidal: {result['tidal_playlist_url']}\n\n")
         else:
-            report_lines.append(f"- Tidal: Not created (dry run)")
+            sections.write(f"- Tidal: Not created (dry run)\n\n")
 
-        report_lines.append("")
-
-        if result['spotify_playlist'].get('description'):
-            report_lines.append(f"*{result['spotify_playlist']['description']}*")
-            report_lines.append("")
+        if playlist.get('description'):
+            sections.write(f"*{playlist['description']}*\n\n")
 
         # List tracks not found
         not_found = [tr for tr in result['track_results'] if not tr['tidal_found']]
         if not_found:
-            report_lines.append(f"**Tracks not found on Tidal ({len(not_found)}):**")
-            report_lines.append("")
+            sections.write(f"**Tracks not found on Tidal ({len(not_found)}):**\n\n")
             for tr in not_found[:20]:  # Limit to first 20
-                track = tr['spotify_track']
+                track = tracks_by_id.get(tr['spotify_track_id'])
+                if track is None:  # No longer in the exported tracks
+                    sections.write(f"- Spotify track {tr['spotify_track_id']}\n")
+                    continue
                 artists = ", ".join(track['artists'])
-                report_lines.append(f"- {artists} - {track['name']}")
+                sections.write(f"- {artists} - {track['name']}\n")
 
             if len(not_found) > 20:
-                report_lines.append(f"- *(and {len(not_found) - 20} more)*")
+                sections.write(f"- *(and {len(not_found) - 20} more)*\n")
+
+            sections.write("\n")
 
-            report_lines.append("")
+        sections.write("---\n\n")
 
-        report_lines.append("---")
-        report_lines.append("")
+    overall_match_rate = total_found / total_tracks if total_tracks > 0 else 0
 
-    # Save report
+    # Write the markdown report
     report_file = DATA_DIR / "playlist_migration_report.md"
     with open(report_file, "w") as f:
-        f.write("\n".join(report_lines))
+        f.write("# Spotify to Tidal Playlist Migration Report\n\n")
+        f.write(f"**Total Playlists:** {total_playlists}\n")
+        f.write(f"**Total Tracks:** {total_tracks}\n")
+        f.write(f"**Tracks Found on Tidal:** {total_found} ({overall_match_rate*100:.1f}%)\n")
+        f.write(f"**Tracks Not Found:** {total_tracks - total_found}\n\n")
+        f.write("---\n\n")
+        f.write("## Playlists\n\n")
+        f.write(sections.getvalue())
 
     print(f"\n✓ Generated report: {report_file}")
 
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Export Spotify playlists and migrate them to Tidal in a single pass.
+
+Playlists are fetched from Spotify and handed to the Tidal migration as
+soon as each one is ready, so Spotify and Tidal requests overlap instead
+of running one whole step after the other.
+"""
+import asyncio
+from pathlib import Path
+from tidal_auth import load_tidal_session
+from io_utils import dump_json, write_jsonl
+from playlist_exporter import (
+    build_playlist_data,
+    get_playlist_track_ids,
+    get_spotify_client,
+    get_tracks,
+    get_user_playlists,
+)
+from playlist_migrator import generate_playlist_report, migrate_playlist, open_search_cache
+
+DATA_DIR = Path("data")
+
+# Number of playlists migrated to Tidal at the same time
+MAX_CONCURRENT_PLAYLISTS = 2
+
+async def produce_playlists(sp, queue, tracks_by_id, exported_playlists):
+    """
+    Fetch the user's playlists from Spotify and put each one on the queue.
+    Track info is fetched once per unique track and collected in tracks_by_id.
+    """
+    playlists, _ = await asyncio.to_thread(get_user_playlists, sp)
+
+    for i, playlist in enumerate(playlists, 1):
+        print(f"\n[{i}/{len(playlists)}] Exporting: {playlist['name']}")
+
+        track_ids = await asyncio.to_thread(get_playlist_track_ids, sp, playlist['id'])
+
+        # Only fetch tracks not already seen in an earlier playlist
+        new_ids = [tid for tid in dict.fromkeys(track_ids) if tid not in tracks_by_id]
+        if new_ids:
+            tracks_by_id.update(await asyncio.to_thread(get_tracks, sp, new_ids))
+
+        playlist_data = build_playlist_data(playlist, track_ids, tracks_by_id)
+        exported_playlists.append(playlist_data)
+        await queue.put(playlist_data)
+
+    # Tell every consumer there is nothing left
+    for _ in range(MAX_CONCURRENT_PLAYLISTS):
+        await queue.put(None)
+
+async def consume_playlists(queue, tidal_session, search_cache, results_file, dry_run):
+    """Migrate playlists from the queue to Tidal until the producer is done"""
+    while True:
+        playlist = await queue.get()
+        if playlist is None:
+            break
+
+        print(f"\nMigrating: {playlist['name']}")
+        result = await migrate_playlist(playlist, tidal_session, search_cache, dry_run)
+        write_jsonl(result, results_file)
+
+async def run_pipeline(sp, tidal_session, dry_run=False, snapshot=False):
+    """Run the Spotify export and the Tidal migration concurrently"""
+    queue = asyncio.Queue(maxsize=MAX_CONCURRENT_PLAYLISTS)
+    tracks_by_id = {}
+    exported_playlists = []
+
+    # Results are written one playlist per line as soon as each one is done
+    output_file = DATA_DIR / "playlist_migration_results.jsonl"
+    with open_search_cache() as search_cache, open(output_file, "wb") as results_file:
+        await asyncio.gather(
+            produce_playlists(sp, queue, tracks_by_id, exported_playlists),
+            *[
+                consume_playlists(queue, tidal_session, search_cache, results_file, dry_run)
+                for _ in range(MAX_CONCURRENT_PLAYLISTS)
+            ]
+        )
+
+    print(f"\n✓ Saved migration results to {output_file}")
+
+    # The playlist report looks up Spotify track details here
+    tracks_file = DATA_DIR / "spotify_tracks.json"
+    dump_json(tracks_by_id, tracks_file)
+
+    if snapshot:
+        playlists_file = DATA_DIR / "spotify_playlists.json"
+        dump_json(exported_playlists, playlists_file)
+        print(f"✓ Saved playlist snapshot to {playlists_file}")
+
+    return len(exported_playlists)
+
+if __name__ == "__main__":
+    import sys
+
+    dry_run = "--dry-run" in sys.argv
+    snapshot = "--snapshot" in sys.argv
+
+    if dry_run:
+        print("Running in DRY RUN mode - will not create playlists\n")
+
+    sp = get_spotify_client()
+
+    # Load Tidal session
+    tidal_session = load_tidal_session()
+    if not tidal_session:
+        print("Failed to authenticate with Tidal")
+        sys.exit(1)
+
+    results = asyncio.run(run_pipeline(sp, tidal_session, dry_run=dry_run, snapshot=snapshot))
+    if results:
+        generate_playlist_report()
@@ -2,11 +2,14 @@
 """
 Collects followed artists and top artists from Spotify.
 """
-import json
 import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from http_utils import create_pooled_session
+from io_utils import dump_json, load_json
 
 # Create data directory if it doesn't exist
 DATA_DIR = Path("data")
@@ -14,8 +17,7 @@ DATA_DIR.mkdir(exist_ok=True)
 
 def load_config():
     """Load configuration from config.json"""
-    with open("config.json", "r") as f:
-        return json.load(f)
+    return load_json("config.json")
 
 def get_spotify_client():
     """Initialize and return Spotify client with user authentication"""
@@ -23,46 +25,47 @@ def get_spotify_client():
 
     scope = "user-follow-read user-top-read"
 
-    sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-        client_id=config["spotify"]["client_id"],
-        client_secret=config["spotify"]["client_secret"],
-        redirect_uri=config["spotify"]["redirect_uri"],
-        scope=scope,
-        cache_path=".spotify_cache"
-    ))
+    sp = spotipy.Spotify(
+        auth_manager=SpotifyOAuth(
+            client_id=config["spotify"]["client_id"],
+            client_secret=config["spotify"]["client_secret"],
+            redirect_uri=config["spotify"]["redirect_uri"],
+            scope=scope,
+            cache_path=".spotify_cache"
+        ),
+        requests_session=create_pooled_session()
+    )
 
     return sp
 
+def get_artist_info(artist):
+    """Extract the relevant information from a Spotify artist object"""
+    return {
+        "name": artist["name"],
+        "id": artist["id"],
+        "genres": artist.get("genres", []),
+        "popularity": artist.get("popularity", 0),
+        "followers": artist.get("followers", {}).get("total", 0),
+        "spotify_url": artist["external_urls"]["spotify"]
+    }
+
 def get_followed_artists(sp):
     """Get all artists the user follows"""
     print("Fetching followed artists...")
-    artists = []
 
+    # Extract relevant information page by page, without keeping the raw artist objects
     results = sp.current_user_followed_artists(limit=50)
-    artists.extend(results['artists']['items'])
+    artist_data = [get_artist_info(artist) for artist in results['artists']['items']]
 
     while results['artists']['next']:
         results = sp.next(results['artists'])
-        artists.extend(results['artists']['items'])
-
-    print(f"Found {len(artists)} followed artists")
-
-    # Extract relevant information
-    artist_data = []
-    for artist in artists:
-        artist_data.append({
-            "name": artist["name"],
-            "id": artist["id"],
-            "genres": artist.get("genres", []),
-            "popularity": artist.get("popularity", 0),
-            "followers": artist.get("followers", {}).get("total", 0),
-            "spotify_url": artist["external_urls"]["spotify"]
-        })
+        artist_data.extend(get_artist_info(artist) for artist in results['artists']['items'])
+
+    print(f"Found {len(artist_data)} followed artists")
 
     # Save to file
     output_file = DATA_DIR / "spotify_followed_artists.json"
-    with open(output_file, "w") as f:
-        json.dump(artist_data, f, indent=2)
+    dump_json(artist_data, output_file)
 
     print(f"Saved followed artists to {output_file}")
     return artist_data
@@ -72,25 +75,23 @@ def get_top_artists(sp, time_ranges=["short_term", "medium_term", "long_term"]):
     print("Fetching top artists...")
     all_top_artists = {}
 
-    for time_range in time_ranges:
-        print(f"  Fetching {time_range} top artists...")
-        results = sp.current_user_top_artists(limit=50, time_range=time_range)
-
-        all_top_artists[time_range] = []
-        for artist in results['items']:
-            all_top_artists[time_range].append({
-                "name": artist["name"],
-                "id": artist["id"],
-                "genres": artist.get("genres", []),
-                "popularity": artist.get("popularity", 0),
-                "followers": artist.get("followers", {}).get("total", 0),
-                "spotify_url": artist["external_urls"]["spotify"]
-            })
+    # The time ranges are independent, so fetch them all at once
+    with ThreadPoolExecutor(max_workers=max(len(time_ranges), 1)) as executor:
+        futures = {}
+        for time_range in time_ranges:
+            print(f"  Fetching {time_range} top artists...")
+            futures[time_range] = executor.submit(
+                sp.current_user_top_artists, limit=50, time_range=time_range
+            )
+
+    for time_range, future in futures.items():
+        results = future.result()
+
+        all_top_artists[time_range] = [get_artist_info(artist) for artist in results['items']]
 
     # Save to file
     output_file = DATA_DIR / "spotify_top_artists.json"
-    with open(output_file, "w") as f:
-        json.dump(all_top_artists, f, indent=2)
+    dump_json(all_top_artists, output_file)
 
     print(f"Saved top artists to {output_file}")
     return all_top_artists
@@ -104,40 +105,33 @@ def get_combined_artists():
         print("Error: Artist data files not found. Run collection first.")
         return []
 
-    with open(followed_file, "r") as f:
-        followed = json.load(f)
-
-    with open(top_file, "r") as f:
-        top_artists = json.load(f)
+    followed = load_json(followed_file)
+    top_artists = load_json(top_file)
 
-    # Combine all artists by ID to avoid duplicates
+    # Combine all artists by ID to avoid duplicates, collecting the sources
+    # of each one and keeping the first copy of its data
     artists_dict = {}
+    sources = defaultdict(set)
 
     # Add followed artists
     for artist in followed:
-        artists_dict[artist["id"]] = {
-            **artist,
-            "source": ["followed"]
-        }
+        artists_dict.setdefault(artist["id"], artist)
+        sources[artist["id"]].add("followed")
 
     # Add top artists
     for time_range, artists in top_artists.items():
         for artist in artists:
-            if artist["id"] in artists_dict:
-                if time_range not in artists_dict[artist["id"]]["source"]:
-                    artists_dict[artist["id"]]["source"].append(time_range)
-            else:
-                artists_dict[artist["id"]] = {
-                    **artist,
-                    "source": [time_range]
-                }
+            artists_dict.setdefault(artist["id"], artist)
+            sources[artist["id"]].add(time_range)
 
+    # The loaded dicts are ours, so the sources are attached in place
     combined = list(artists_dict.values())
+    for artist in combined:
+        artist["source"] = sorted(sources[artist["id"]])
 
     # Save combined list
     output_file = DATA_DIR / "spotify_all_artists.json"
-    with open(output_file, "w") as f:
-        json.dump(combined, f, indent=2)
+    dump_json(combined, output_file)
 
     print(f"\nTotal unique artists: {len(combined)}")
     print(f"Saved combined list to {output_file}")
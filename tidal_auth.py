@@ -2,9 +2,67 @@
 """
 Tidal authentication setup.
 """
-import json
+import time
 import tidalapi
 from pathlib import Path
+from requests.exceptions import RetryError
+from urllib3.exceptions import MaxRetryError, ResponseError
+from tidalapi.exceptions import TooManyRequests
+from http_utils import TokenBucket, get_retry_after, mount_pooled_adapter
+from io_utils import dump_json, load_json
+
+# Shared limit on requests made to the Tidal API
+TIDAL_RATE_LIMITER = TokenBucket(rate=10, capacity=10)
+
+# Seconds to wait after a 429 that doesn't say how long to back off
+DEFAULT_RETRY_AFTER = 1.0
+
+def get_throttle_delay(error):
+    """Get how long to wait after Tidal answered 429 Too Many Requests"""
+    if isinstance(error, TooManyRequests):
+        retry_after = getattr(error, "retry_after", None) or -1
+        if retry_after > 0:
+            return retry_after
+
+        # tidalapi 0.7.x has no retry_after and raises TooManyRequests while
+        # handling the original HTTPError, so its response is on __context__
+        original = error.__cause__ or error.__context__
+        response = getattr(original, "response", None)
+        if response is not None:
+            return get_retry_after(response, DEFAULT_RETRY_AFTER)
+
+    return DEFAULT_RETRY_AFTER
+
+def is_throttled_retry_error(error):
+    """Check whether the pooled adapter gave up on a request because of repeated 429s"""
+    max_retry = error.args[0] if error.args else None
+    reason = getattr(max_retry, "reason", None) if isinstance(max_retry, MaxRetryError) else None
+    return (
+        isinstance(reason, ResponseError)
+        and str(reason) == ResponseError.SPECIFIC_ERROR.format(status_code=429)
+    )
+
+def call_rate_limited(bucket, func, *args, max_attempts=5, **kwargs):
+    """
+    Call a Tidal API function once a token is available from bucket.
+    If Tidal still throttles the request, wait as long as it asks and try
+    again, up to max_attempts times.
+
+    tidalapi reports a 429 as TooManyRequests. GET requests are already
+    retried by the pooled adapter, which raises RetryError once its own
+    retries run out; that is retried here too, after the default delay,
+    but only if the adapter gave up because of 429s rather than 5xx errors.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with bucket:
+                return func(*args, **kwargs)
+        except (TooManyRequests, RetryError) as e:
+            if attempt == max_attempts:
+                raise
+            if isinstance(e, RetryError) and not is_throttled_retry_error(e):
+                raise
+            time.sleep(get_throttle_delay(e))
 
 def setup_tidal_session():
     """
@@ -12,6 +70,7 @@ def setup_tidal_session():
     This will prompt you to log in via your browser.
     """
     session = tidalapi.Session()
+    mount_pooled_adapter(session.request_session)
 
     # OAuth login
     print("Setting up Tidal authentication...")
@@ -37,8 +96,7 @@ def setup_tidal_session():
             "expiry_time": session.expiry_time.isoformat() if session.expiry_time else None
         }
 
-        with open(".tidal_session.json", "w") as f:
-            json.dump(session_data, f, indent=2)
+        dump_json(session_data, ".tidal_session.json")
 
         print("Session saved to .tidal_session.json")
         return session
@@ -49,12 +107,12 @@ def setup_tidal_session():
 def load_tidal_session():
     """Load existing Tidal session or create a new one."""
     session = tidalapi.Session()
+    mount_pooled_adapter(session.request_session)
 
     if Path(".tidal_session.json").exists():
         print("Loading existing Tidal session...")
         try:
-            with open(".tidal_session.json", "r") as f:
-                session_data = json.load(f)
+            session_data = load_json(".tidal_session.json")
 
             session.load_oauth_session(
                 session_data["token_type"],
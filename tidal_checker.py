@@ -2,20 +2,30 @@
 """
 Checks if Spotify artists are available on Tidal and generates a report.
 """
-import json
-import time
+import asyncio
+import shelve
 from pathlib import Path
 import tidalapi
-from tidal_auth import load_tidal_session
+from tidal_auth import TIDAL_RATE_LIMITER, call_rate_limited, load_tidal_session
+from io_utils import dump_json, load_json
 
 DATA_DIR = Path("data")
 
-def search_artist_on_tidal(artist_name, tidal_session):
+# Maximum number of Tidal searches in flight at once
+MAX_CONCURRENT_SEARCHES = 8
+
+# Persistent cache of Tidal artist matches, reused across runs
+SEARCH_CACHE_FILE = ".tidal_artist_cache"
+
+async def search_artist_on_tidal(artist_name, tidal_session):
     """
     Search for an artist on Tidal using the authenticated API.
     """
     try:
-        results = tidal_session.search(artist_name, models=[tidalapi.artist.Artist], limit=5)
+        results = await asyncio.to_thread(
+            call_rate_limited, TIDAL_RATE_LIMITER, tidal_session.search,
+            artist_name, models=[tidalapi.artist.Artist], limit=5
+        )
 
         if results.get('artists') and len(results['artists']) > 0:
             # Get the first match
@@ -33,6 +43,35 @@ def search_artist_on_tidal(artist_name, tidal_session):
         print(f"  Error searching for {artist_name}: {e}")
         return {"found": False, "error": str(e)}
 
+async def search_artists_on_tidal(artists, tidal_session, cache):
+    """
+    Search for several artists on Tidal concurrently.
+    Returns the search results in the same order as the input artists.
+
+    Artists found on Tidal are stored in cache, keyed by name, so they are
+    not searched again on later runs.
+    """
+    sem = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+    done = 0
+
+    async def bounded_search(artist):
+        nonlocal done
+        if artist['name'] in cache:
+            tidal_result = cache[artist['name']]
+        else:
+            async with sem:
+                tidal_result = await search_artist_on_tidal(artist['name'], tidal_session)
+            if tidal_result.get("found"):
+                cache[artist['name']] = tidal_result
+
+        done += 1
+        print(f"[{done}/{len(artists)}] Checked: {artist['name']}")
+
+        return tidal_result
+
+    tasks = [bounded_search(artist) for artist in artists]
+    return await asyncio.gather(*tasks)
+
 def check_artists_on_tidal():
     """Check all Spotify artists on Tidal"""
     input_file = DATA_DIR / "spotify_all_artists.json"
@@ -41,8 +80,7 @@ def check_artists_on_tidal():
         print(f"Error: {input_file} not found. Run spotify_collector.py first.")
         return
 
-    with open(input_file, "r") as f:
-        artists = json.load(f)
+    artists = load_json(input_file)
 
     print(f"Checking {len(artists)} artists on Tidal...\n")
 
@@ -54,11 +92,10 @@ def check_artists_on_tidal():
 
     results = []
 
-    for i, artist in enumerate(artists, 1):
-        print(f"[{i}/{len(artists)}] Checking: {artist['name']}")
-
-        tidal_result = search_artist_on_tidal(artist['name'], tidal_session)
+    with shelve.open(SEARCH_CACHE_FILE) as search_cache:
+        tidal_results = asyncio.run(search_artists_on_tidal(artists, tidal_session, search_cache))
 
+    for artist, tidal_result in zip(artists, tidal_results):
         result = {
             **artist,
             "tidal_found": tidal_result.get("found", False),
@@ -72,13 +109,9 @@ def check_artists_on_tidal():
 
         results.append(result)
 
-        # Be respectful with rate limiting
-        time.sleep(0.3)
-
     # Save results
     output_file = DATA_DIR / "tidal_availability.json"
-    with open(output_file, "w") as f:
-        json.dump(results, f, indent=2)
+    dump_json(results, output_file)
 
     print(f"\n✓ Saved results to {output_file}")
     return results
@@ -91,52 +124,39 @@ def generate_report():
         print(f"Error: {input_file} not found. Run check first.")
         return
 
-    with open(input_file, "r") as f:
-        results = json.load(f)
-
-    found_count = sum(1 for r in results if r["tidal_found"])
-    not_found_count = len(results) - found_count
-
-    # Generate markdown report
-    report_lines = [
-        "# Spotify to Tidal Artist Migration Report",
-        "",
-        f"**Total Artists:** {len(results)}",
-        f"**Found on Tidal:** {found_count} ({found_count/len(results)*100:.1f}%)",
-        f"**Not Found:** {not_found_count} ({not_found_count/len(results)*100:.1f}%)",
-        "",
-        "---",
-        "",
-        "## Artists Found on Tidal",
-        ""
-    ]
+    results = load_json(input_file)
 
+    # Split the results into found and not found in a single pass
+    found, not_found = [], []
     for result in results:
-        if result["tidal_found"]:
-            source_str = ", ".join(result["source"])
-            report_lines.append(f"- **{result['name']}** ({source_str})")
-            report_lines.append(f"  - Spotify: {result['spotify_url']}")
-            report_lines.append(f"  - Tidal: {result['tidal_url']}")
-            report_lines.append("")
-
-    report_lines.extend([
-        "---",
-        "",
-        "## Artists NOT Found on Tidal",
-        ""
-    ])
+        (found if result["tidal_found"] else not_found).append(result)
 
-    for result in results:
-        if not result["tidal_found"]:
-            source_str = ", ".join(result["source"])
-            report_lines.append(f"- **{result['name']}** ({source_str})")
-            report_lines.append(f"  - Spotify: {result['spotify_url']}")
-            report_lines.append("")
+    found_count = len(found)
+    not_found_count = len(not_found)
 
-    # Save report
+    # Write the markdown report straight to the file
     report_file = DATA_DIR / "migration_report.md"
     with open(report_file, "w") as f:
-        f.write("\n".join(report_lines))
+        f.write("# Spotify to Tidal Artist Migration Report\n\n")
+        f.write(f"**Total Artists:** {len(results)}\n")
+        f.write(f"**Found on Tidal:** {found_count} ({found_count/len(results)*100:.1f}%)\n")
+        f.write(f"**Not Found:** {not_found_count} ({not_found_count/len(results)*100:.1f}%)\n\n")
+        f.write("---\n\n")
+        f.write("## Artists Found on Tidal\n\n")
+
+        for result in found:
+            source_str = ", ".join(result["source"])
+            f.write(f"- **{result['name']}** ({source_str})\n")
+            f.write(f"  - Spotify: {result['spotify_url']}\n")
+            f.write(f"  - Tidal: {result['tidal_url']}\n\n")
+
+        f.write("---\n\n")
+        f.write("## Artists NOT Found on Tidal\n\n")
+
+        for result in not_found:
+            source_str = ", ".join(result["source"])
+            f.write(f"- **{result['name']}** ({source_str})\n")
+            f.write(f"  - Spotify: {result['spotify_url']}\n\n")
 
     print(f"\n✓ Generated report: {report_file}")
 